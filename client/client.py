@@ -9,9 +9,16 @@ class Client:
         self.tunnel = dnstunnel.DNSTunnelClient(server_ip, server_port, domain)
 
     def _parse_response(self, data: str) -> str:
-        splitted = data.split("|||")
-        data = splitted[splitted.index("DATA") + 1]
-        return data
+        # The field after a "DATA" field, found without splitting the whole response
+        if data.startswith("DATA|||"):
+            start = len("DATA|||")
+        else:
+            start = data.find("|||DATA|||")
+            if start == -1:
+                return ""
+            start += len("|||DATA|||")
+        end = data.find("|||", start)
+        return data[start:] if end == -1 else data[start:end]
 
     def ack(self):
         response = self.tunnel.send_and_receive("ACK".encode(), timeout=5)
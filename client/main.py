@@ -1,6 +1,7 @@
 import client as networkclient
 import wordwrapper
 import pythoncom
+import win32event
 
 
 server_ip = "51.175.238.64"
@@ -39,7 +40,10 @@ def main():
 
     word.on_word_deactivated = handle_deactivated
 
+    # Sleep until a message arrives (e.g. the focus hook), then pump once
     while True:
+        win32event.MsgWaitForMultipleObjectsEx(
+            [], win32event.INFINITE, win32event.QS_ALLINPUT, win32event.MWMO_INPUTAVAILABLE)
         pythoncom.PumpWaitingMessages()
 
 if __name__ == "__main__":
@@ -5,6 +5,7 @@ import win32process
 import win32con
 import win32api
 import ctypes
+from collections import OrderedDict
 from ctypes import wintypes
 from ctypes import windll, CFUNCTYPE, c_int, c_void_p, POINTER
 
@@ -30,6 +31,10 @@ class WordWrapper:
 
         self._last_active_was_word = False
 
+        # (pid, creation time) -> whether the process is WINWORD.EXE (small LRU)
+        self._pid_is_word_cache = OrderedDict()
+        self._pid_cache_size = 256
+
         # start listening to window focus changes
         self._start_focus_hook()
 
@@ -37,11 +42,34 @@ class WordWrapper:
         """Check if the foreground window belongs to WINWORD.EXE."""
         try:
             _, pid = win32process.GetWindowThreadProcessId(hwnd)
+        except:
+            return False
+
+        try:
             handle = win32api.OpenProcess(0x0400 | 0x0010, False, pid)
+        except:
+            return False
+
+        try:
+            # A process keeps its exe path for life, but pids are reused, so the
+            # answer is cached per process: pid plus its creation time
+            key = (pid, win32process.GetProcessTimes(handle)["CreationTime"])
+            cached = self._pid_is_word_cache.get(key)
+            if cached is not None:
+                self._pid_is_word_cache.move_to_end(key)
+                return cached
+
             exe_path = win32process.GetModuleFileNameEx(handle, 0)
-            return "WINWORD.EXE" in exe_path.upper()
         except:
             return False
+        finally:
+            win32api.CloseHandle(handle)
+
+        result = "WINWORD.EXE" in exe_path.upper()
+        self._pid_is_word_cache[key] = result
+        if len(self._pid_is_word_cache) > self._pid_cache_size:
+            self._pid_is_word_cache.popitem(last=False)
+        return result
 
     def _start_focus_hook(self):
         """Hooks foreground window change."""
@@ -219,19 +247,42 @@ class WordWrapper:
             raise Exception("No document loaded.")
 
         rng = self.doc.Content
-        rng.TextRetrievalMode.IncludeHiddenText = include_hidden
-        full_text = rng.Text
-
-        start = full_text.find(prefix)
-        if start == -1:
-            return None
-
-        start += len(prefix)
-        end = full_text.find(suffix, start)
-        if end == -1:
+        if include_hidden:
+            # Find only sees hidden text while the window displays it; rather than
+            # toggling the user's view (and needing a window at all), scan the text
+            rng.TextRetrievalMode.IncludeHiddenText = True
+            full_text = rng.Text
+
+            start = full_text.find(prefix)
+            if start == -1:
+                return None
+
+            start += len(prefix)
+            end = full_text.find(suffix, start)
+            if end == -1:
+                return None
+
+            return full_text[start:end]
+
+        # Let Word search natively so only the match is marshaled over COM,
+        # not the whole document text
+        find = rng.Find
+        find.ClearFormatting()
+        pattern = f"{self._escape_wildcards(prefix)}*{self._escape_wildcards(suffix)}"
+        if not find.Execute(FindText=pattern, MatchWildcards=True, Forward=True, Wrap=0):  # wdFindStop
             return None
 
-        return full_text[start:end]
+        # rng now spans the match
+        rng.TextRetrievalMode.IncludeHiddenText = False
+        text = rng.Text
+        return text[len(prefix):len(text) - len(suffix)]
+
+    @staticmethod
+    def _escape_wildcards(text: str) -> str:
+        """Escape Word wildcard metacharacters so text matches literally."""
+        # A literal caret is "^^" in Word; the others take a backslash
+        return "".join("^^" if c == "^" else "\\" + c if c in "\\()[]{}<>?*@!" else c
+                       for c in text)
 
     def save(self):
         if self.doc:
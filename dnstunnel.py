@@ -3,16 +3,59 @@
 DNS Tunnel Library - Pure Transport Layer with Chunking Support
 Provides DNSTunnelClient and DNSTunnelServer as network communication primitives.
 Automatically handles large data by chunking responses.
+
+Data is carried as unpadded, case-sensitive base64url. The client talks to the
+server directly over UDP, so no resolver case-folds the labels; this does not
+survive recursive resolvers or other middle boxes that rewrite query names.
 """
 
+import os
+import re
+import errno
+import ctypes
+import logging
+import sys
 import socket
+import selectors
+import queue
 import base64
 import struct
 import random
 import time
 import threading
-from typing import Optional, Callable
-from collections import defaultdict
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Dict, List, Tuple
+
+log = logging.getLogger(__name__)
+
+# Precompiled wire formats shared by client and server
+_HDR = struct.Struct('!HHHHHH')  # DNS header: id, flags, qd/an/ns/ar counts
+_U16 = struct.Struct('!H')
+_TYPECLASS = struct.Struct('!HH')
+_ANSWER_FIXED = struct.Struct('!HHI')  # answer type, class, TTL
+_TXT_START = struct.Struct('!HB')  # TXT rdlength and first string length
+
+
+def _pack_question(buf: bytearray, offset: int, name: bytes, query_type: int) -> int:
+    """Write a DNS question section (labels, type, class IN) into buf at offset.
+    Returns the offset just past it."""
+    for label in name.split(b'.'):
+        if label:
+            length = len(label)
+            buf[offset] = length
+            buf[offset+1:offset+1+length] = label
+            offset += length + 1
+    buf[offset] = 0
+    _TYPECLASS.pack_into(buf, offset + 1, query_type, 1)
+    return offset + 5
+
+
+def _encode_question(name: bytes, query_type: int) -> bytearray:
+    """Encode a DNS question section (labels, type, class IN) into one buffer."""
+    question = bytearray(len(name) + 6)
+    del question[_pack_question(question, 0, name, query_type):]
+    return question
 
 # ============================================================================
 # DNS TUNNEL CLIENT - Pure Transport Layer with Chunking
@@ -41,62 +84,115 @@ class DNSTunnelClient:
         self.session_id = random.randint(1000, 9999)
         self.timeout = 5
         self.max_response_chunk = 180  # Max bytes per response chunk
+        self.wait_poll_interval = 0.02  # Delay between polls while the server is still streaming
+        
+        # Transaction ids count up from a random start instead of being drawn per query
+        self._txid = random.randint(0, 65535)
+        
+        # Encoded domain labels + qtype/qclass for A (send) and TXT (receive) queries.
+        # Every query only adds its one tunnel label in front of these.
+        self._question_suffixes = {
+            query_type: bytes(_encode_question(self.domain.encode('ascii'), query_type))
+            for query_type in (1, 16)
+        }
+        
+        # Persistent UDP socket, created lazily and reused for every query
+        self._sock = None
+        self._sock_lock = threading.Lock()
+    
+    def close(self):
+        """Close the underlying socket. A new one is created on next use."""
+        with self._sock_lock:
+            if self._sock:
+                self._sock.close()
+                self._sock = None
     
-    def send(self, data: bytes, chunk_delay: float = 0.05) -> bool:
+    def send(self, data: bytes, chunk_delay: float = 0.0) -> bool:
         """
         Send raw bytes through DNS tunnel.
         
+        All chunk queries are sent back-to-back, then their ACKs are collected,
+        so a multi-chunk send costs roughly one round trip instead of one per chunk.
+        
         Args:
             data: Bytes to send
-            chunk_delay: Delay between chunks in seconds
+            chunk_delay: Ignored, kept for compatibility (progress is driven by ACKs)
             
         Returns:
             True if successful, False otherwise
         """
         chunks = self._encode_data(data)
         total_chunks = len(chunks)
+        addr = (self.server_ip, self.server_port)
         
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(self.timeout)
+        # Build every query up front and track their transaction ids
+        queries = [
+            self._create_dns_query(b"%d-%d-%d-" % (self.session_id, i, total_chunks) + chunk)
+            for i, chunk in enumerate(chunks)
+        ]
+        pending_txids = {_U16.unpack_from(query, 0)[0] for query in queries}
         
-        try:
-            for i, chunk in enumerate(chunks):
-                subdomain = f"{self.session_id}-{i}-{total_chunks}-{chunk}"
-                query = self._create_dns_query(subdomain)
-                sock.sendto(query, (self.server_ip, self.server_port))
+        with self._sock_lock:
+            sock = self._get_sock()
+            sock.settimeout(self.timeout)
+            
+            try:
+                for query in queries:
+                    sock.sendto(query, addr)
                 
+                # Drain ACKs. Lost chunks are not resent: the server ACKs the
+                # completing chunk only after its callback returns, so a slow
+                # callback looks like a loss and a resend would redeliver data.
                 try:
-                    response, _ = sock.recvfrom(512)
+                    while pending_txids:
+                        response, _ = sock.recvfrom(512)
+                        if len(response) >= 2:
+                            pending_txids.discard(_U16.unpack_from(response, 0)[0])
                 except socket.timeout:
                     pass
                 
-                time.sleep(chunk_delay)
-            
-            return True
-        except Exception as e:
-            print(f"[DNSTunnelClient] Send error: {e}")
-            return False
-        finally:
-            sock.close()
+                return True
+            except Exception as e:
+                print(f"[DNSTunnelClient] Send error: {e}")
+                return False
     
-    def receive(self, timeout: Optional[int] = None, max_chunks: int = 100) -> Optional[bytes]:
+    def receive(self, timeout: Optional[int] = None, max_chunks: int = 100,
+                max_stream_chunks: int = 2000) -> Optional[bytes]:
         """
         Receive raw bytes through DNS tunnel with automatic chunk reassembly.
         
         Args:
             timeout: Timeout in seconds per chunk (uses default if None)
             max_chunks: Maximum number of chunks to receive
+            max_stream_chunks: Maximum number of chunks once the server streams the
+                response (streamed segments can be short, so more are allowed)
             
         Returns:
-            Received bytes or None if no data/timeout
+            Received bytes or None if no data/timeout or the response exceeds the limit
         """
         all_data = []
         chunk_num = 0
-        total_chunks = None
+        limit = max_chunks
+        wait_deadline = None
         
-        while chunk_num < max_chunks:
+        while True:
+            if chunk_num >= limit:
+                print(f"[DNSTunnelClient] Error: Response exceeds {limit} chunks")
+                return None
+            
             chunk_string = self._receive_chunk(chunk_num, timeout)
             
+            if chunk_string == "WAIT:":
+                # Server is still streaming this response; poll again until timeout
+                now = time.time()
+                if wait_deadline is None:
+                    wait_deadline = now + (timeout or self.timeout)
+                if now < wait_deadline:
+                    time.sleep(self.wait_poll_interval)
+                    continue
+                chunk_string = None
+            wait_deadline = None
+            
             if chunk_string is None:
                 # No more chunks or timeout
                 if chunk_num == 0:
@@ -108,26 +204,26 @@ class DNSTunnelClient:
             
             # Check if this is a chunked response
             if chunk_string.startswith("CHUNK:"):
-                # Parse: "CHUNK:N/T:base32data"
+                # Parse: "CHUNK:N/T:base64data" (T is 0 until the last streamed chunk)
                 try:
                     parts = chunk_string.split(":", 2)
                     if len(parts) >= 3:
                         chunk_info = parts[1]  # "N/T"
-                        data_part = parts[2]   # base32-encoded data
+                        data_part = parts[2]   # base64url-encoded data
                         
                         current_chunk, total = chunk_info.split("/")
                         current_chunk = int(current_chunk)
                         total = int(total)
                         
-                        if total_chunks is None:
-                            total_chunks = total
-                        
-                        # Store the base32-encoded data part
+                        # Store the base64url-encoded data part
                         all_data.append(data_part)
                         chunk_num += 1
+                        if not total:
+                            # Streamed segment: every chunk still counts, against the larger limit
+                            limit = max_stream_chunks
                         
                         # Check if we have all chunks
-                        if len(all_data) >= total:
+                        if total and len(all_data) >= total:
                             break
                     else:
                         # Malformed chunk header
@@ -138,9 +234,9 @@ class DNSTunnelClient:
             else:
                 # Not a chunked response - decode single response directly
                 try:
-                    padding = (8 - len(chunk_string) % 8) % 8
+                    padding = (4 - len(chunk_string) % 4) % 4
                     chunk_string += '=' * padding
-                    return base64.b32decode(chunk_string.upper())
+                    return base64.urlsafe_b64decode(chunk_string)
                 except Exception as e:
                     print(f"[DNSTunnelClient] Error decoding single response: {e}")
                     return None
@@ -149,9 +245,9 @@ class DNSTunnelClient:
         if all_data:
             try:
                 full_encoded = ''.join(all_data)
-                padding = (8 - len(full_encoded) % 8) % 8
+                padding = (4 - len(full_encoded) % 4) % 4
                 full_encoded += '=' * padding
-                return base64.b32decode(full_encoded.upper())
+                return base64.urlsafe_b64decode(full_encoded)
             except Exception as e:
                 print(f"[DNSTunnelClient] Error reassembling chunks: {e}")
                 return None
@@ -159,95 +255,111 @@ class DNSTunnelClient:
         return None
     
     def _receive_chunk(self, chunk_num: int, timeout: Optional[int] = None) -> Optional[str]:
-        """Receive a single chunk from server. Returns base32 string, not decoded bytes."""
-        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        sock.settimeout(timeout or self.timeout)
-        
-        try:
-            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 65536)
-        except:
-            pass
-        
-        try:
-            subdomain = f"recv-{self.session_id}-{chunk_num}"
-            query = self._create_dns_query(subdomain, query_type=16)
-            sock.sendto(query, (self.server_ip, self.server_port))
-            
-            response, _ = sock.recvfrom(2048)
-            data = self._parse_dns_response(response)
+        """Receive a single chunk from server. Returns base64url string, not decoded bytes."""
+        with self._sock_lock:
+            sock = self._get_sock()
+            sock.settimeout(timeout or self.timeout)
             
-            # Return the raw base32 string (or chunk header string)
-            # Don't decode yet - let receive() handle it
-            return data if data else None
+            try:
+                subdomain = b"recv-%d-%d" % (self.session_id, chunk_num)
+                query = self._create_dns_query(subdomain, query_type=16)
+                sock.sendto(query, (self.server_ip, self.server_port))
                 
-        except socket.timeout:
-            return None
-        except OSError as e:
-            if hasattr(e, 'winerror') and e.winerror == 10040:
-                print(f"[DNSTunnelClient] Error: Response too large even after chunking")
-            return None
-        except Exception as e:
-            return None
-        finally:
-            sock.close()
+                response = self._recv_reply(sock, query, 2048)
+                data = self._parse_dns_response(response)
+                
+                # Return the raw base64url string (or chunk header string)
+                # Don't decode yet - let receive() handle it
+                return data if data else None
+                    
+            except socket.timeout:
+                return None
+            except OSError as e:
+                if hasattr(e, 'winerror') and e.winerror == 10040:
+                    print(f"[DNSTunnelClient] Error: Response too large even after chunking")
+                return None
+            except Exception as e:
+                return None
     
-    def send_and_receive(self, data: bytes, wait_time: float = 0.5, 
+    def send_and_receive(self, data: bytes, wait_time: float = 0.0, 
                          timeout: Optional[int] = None) -> Optional[bytes]:
         """
         Convenience method: send data and wait for response.
         
+        The server ACKs the last chunk only after its callback has run, so the
+        response can be requested as soon as send() returns.
+        
         Args:
             data: Data to send
-            wait_time: Time to wait between send and receive
+            wait_time: Ignored, kept for compatibility
             timeout: Receive timeout per chunk
             
         Returns:
             Response bytes or None
         """
         if self.send(data):
-            time.sleep(wait_time)
             return self.receive(timeout)
         return None
     
     # Internal methods
+    def _get_sock(self) -> socket.socket:
+        """Return the cached UDP socket, creating it on first use."""
+        if self._sock is None:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                # Room for the burst of ACKs a pipelined send gets back
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024 * 1024)
+            except:
+                pass
+            sock.settimeout(self.timeout)
+            self._sock = sock
+        return self._sock
+    
+    def _recv_reply(self, sock: socket.socket, query: bytes, bufsize: int) -> bytes:
+        """Receive the reply to query, skipping stale replies to earlier queries."""
+        while True:
+            response, _ = sock.recvfrom(bufsize)
+            if response[:2] == query[:2]:
+                return response
+    
     def _encode_data(self, data: bytes, chunk_size: int = 32) -> list:
-        """Encode data into DNS-safe chunks."""
-        encoded = base64.b32encode(data).decode('ascii').lower().rstrip('=')
-        return [encoded[i:i+chunk_size] for i in range(0, len(encoded), chunk_size)]
+        """Encode data into DNS-safe chunks of bytes."""
+        encoded = memoryview(base64.urlsafe_b64encode(data).rstrip(b'='))
+        return [bytes(encoded[i:i+chunk_size]) for i in range(0, len(encoded), chunk_size)]
     
-    def _create_dns_query(self, subdomain: str, query_type: int = 1) -> bytes:
-        """Create DNS query packet."""
-        transaction_id = random.randint(0, 65535)
+    def _create_dns_query(self, subdomain: bytes, query_type: int = 1) -> bytes:
+        """Create DNS query packet. subdomain must be a single label."""
+        self._txid = (self._txid + 1) & 0xFFFF
+        transaction_id = self._txid
         flags = 0x0100
-        header = struct.pack('!HHHHHH', transaction_id, flags, 1, 0, 0, 0)
-        
-        full_domain = f"{subdomain}.{self.domain}"
-        question = b''
-        for label in full_domain.split('.'):
-            question += struct.pack('B', len(label)) + label.encode('ascii')
-        question += b'\x00'
-        question += struct.pack('!HH', query_type, 1)
+        header = _HDR.pack(transaction_id, flags, 1, 0, 0, 0)
         
-        return header + question
+        suffix = self._question_suffixes.get(query_type)
+        if suffix is None:
+            suffix = bytes(_encode_question(self.domain.encode('ascii'), query_type))
+            self._question_suffixes[query_type] = suffix
+        return header + bytes((len(subdomain),)) + subdomain + suffix
     
     def _parse_dns_response(self, response: bytes) -> Optional[str]:
         """Parse DNS response and extract data."""
         try:
-            offset = 12
-            while response[offset] != 0:
-                offset += response[offset] + 1
-            offset += 5
+            # Tunnel names are plain ASCII, so the first zero byte ends the name
+            offset = response.index(b'\x00', 12) + 5
             if len(response) <= offset:
                 return None
             if response[offset] & 0xC0:
                 offset += 2
             else:
-                while response[offset] != 0:
-                    offset += response[offset] + 1
-                offset += 1
+                offset = response.index(b'\x00', offset) + 1
             offset += 8
-            data_len = struct.unpack('!H', response[offset:offset+2])[0]
+            data_len, str_len = _TXT_START.unpack_from(response, offset)
             offset += 2
+            
+            # Common case: a single string filling the record
+            if str_len == data_len - 1 and offset + 1 + str_len <= len(response):
+                return response[offset+1:offset+1+str_len].decode('ascii', errors='ignore')
+            
             data = response[offset:offset+data_len]
             
             # TXT records can have multiple strings
@@ -270,6 +382,99 @@ class DNSTunnelClient:
 # DNS TUNNEL SERVER - Pure Transport Layer with Chunking
 # ============================================================================
 
+class _IOVec(ctypes.Structure):
+    _fields_ = [("iov_base", ctypes.c_void_p), ("iov_len", ctypes.c_size_t)]
+
+
+class _MsgHdr(ctypes.Structure):
+    _fields_ = [
+        ("msg_name", ctypes.c_void_p),
+        ("msg_namelen", ctypes.c_uint32),
+        ("msg_iov", ctypes.POINTER(_IOVec)),
+        ("msg_iovlen", ctypes.c_size_t),
+        ("msg_control", ctypes.c_void_p),
+        ("msg_controllen", ctypes.c_size_t),
+        ("msg_flags", ctypes.c_int),
+    ]
+
+
+class _MMsgHdr(ctypes.Structure):
+    _fields_ = [("msg_hdr", _MsgHdr), ("msg_len", ctypes.c_uint)]
+
+
+class _RecvMmsg:
+    """
+    Batch UDP receiver using Linux recvmmsg(2) through ctypes.
+    
+    Receives up to count IPv4 datagrams per syscall into one contiguous buffer.
+    Returned views are only valid until the next call to recv().
+    """
+    
+    _SOCKADDR_IN_SIZE = 16
+    
+    def __init__(self, sock: socket.socket, count: int, size: int):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self._recvmmsg = libc.recvmmsg
+        self._recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_MMsgHdr), ctypes.c_uint,
+                                   ctypes.c_int, ctypes.c_void_p]
+        self._recvmmsg.restype = ctypes.c_int
+        
+        self._sock = sock
+        self._count = count
+        self._size = size
+        self._buf = bytearray(count * size)
+        self._view = memoryview(self._buf)
+        self._names = ctypes.create_string_buffer(count * self._SOCKADDR_IN_SIZE)
+        self._iovs = (_IOVec * count)()
+        self._msgs = (_MMsgHdr * count)()
+        
+        # Keep the ctypes export alive so the bytearray can never be reallocated
+        self._c_buf = (ctypes.c_char * len(self._buf)).from_buffer(self._buf)
+        base = ctypes.addressof(self._c_buf)
+        names = ctypes.addressof(self._names)
+        for i in range(count):
+            self._iovs[i].iov_base = base + i * size
+            self._iovs[i].iov_len = size
+            hdr = self._msgs[i].msg_hdr
+            hdr.msg_name = names + i * self._SOCKADDR_IN_SIZE
+            hdr.msg_iov = ctypes.pointer(self._iovs[i])
+            hdr.msg_iovlen = 1
+            hdr.msg_namelen = self._SOCKADDR_IN_SIZE
+        
+        # Raw view of the headers, so msg_len is read without ctypes attribute access
+        self._msgs_raw = memoryview(self._msgs).cast('B')
+        self._msg_len = struct.Struct('I')
+        self._addrs = {}  # raw port+address -> (ip, port), bounded
+    
+    def recv(self) -> list:
+        """Return [(view, addr), ...] for the datagrams currently queued."""
+        # msg_namelen needs no reset: the kernel always writes back 16 for IPv4
+        received = self._recvmmsg(self._sock.fileno(), self._msgs, self._count, 0, None)
+        if received < 0:
+            err = ctypes.get_errno()
+            if err in (errno.EAGAIN, errno.EWOULDBLOCK, errno.EINTR):
+                return []
+            raise OSError(err, os.strerror(err))
+        
+        names = self._names.raw
+        msgs = self._msgs_raw
+        stride = ctypes.sizeof(_MMsgHdr)
+        packets = []
+        for i in range(received):
+            # sockaddr_in: family (2 bytes), port and address in network order
+            offset = i * self._SOCKADDR_IN_SIZE
+            name = names[offset+2:offset+8]
+            addr = self._addrs.get(name)
+            if addr is None:
+                addr = (socket.inet_ntoa(name[2:]), int.from_bytes(name[:2], 'big'))
+                if len(self._addrs) < 1024:
+                    self._addrs[name] = addr
+            start = i * self._size
+            length = self._msg_len.unpack_from(msgs, i * stride + _MMsgHdr.msg_len.offset)[0]
+            packets.append((self._view[start:start+length], addr))
+        return packets
+
+
 class DNSTunnelServer:
     """
     DNS Tunnel Server - Handles only network communication.
@@ -279,7 +484,7 @@ class DNSTunnelServer:
     Automatically chunks large responses.
     """
     
-    def __init__(self, listen_ip: str, listen_port: int, domain: str):
+    def __init__(self, listen_ip: str, listen_port: int, domain: str, debug: bool = False):
         """
         Initialize DNS tunnel server.
         
@@ -287,23 +492,86 @@ class DNSTunnelServer:
             listen_ip: IP to bind to (e.g., "127.0.0.1" or "0.0.0.0")
             listen_port: Port to listen on
             domain: Domain to accept queries for
+            debug: Print per-response diagnostics
         """
         self.listen_ip = listen_ip
         self.listen_port = listen_port
         self.domain = domain.rstrip('.').lower()
+        self.debug = debug
+        
+        # Query names stay bytes; only this suffix is compared case-insensitively
+        self._domain_suffix_bytes = b'.' + self.domain.encode('ascii')
+        # The domain's labels in wire format (through the root label), for the fused parser
+        self._domain_wire = bytes(_encode_question(self.domain.encode('ascii'), 0)[:-4])
+        
+        # Matchers for the part in front of the domain, one per query kind so a
+        # data chunk never tries the recv branch (base64url data is case-sensitive)
+        self._match_data = re.compile(rb'(\d+)-(\d+)-(\d+)-([A-Za-z0-9_-]+)').fullmatch
+        self._match_recv = re.compile(rb'recv-(\d+)(?:-(\d+))?').fullmatch
         
         # Internal state
-        self.sessions = defaultdict(dict)
-        self.session_metadata = {}
-        self.response_queue = {}  # session_id -> list of chunks
+        self.sessions: Dict[int, List[Optional[bytes]]] = {}  # session_id -> chunk slots
+        self.session_metadata: Dict[int, list] = {}  # session_id -> [total_chunks, arrived, last_seen]
+        self.response_queue: Dict[int, List[bytes]] = {}  # session_id -> list of encoded chunks
+        self._expiry_heap: List[Tuple[float, int]] = []  # (last_seen when pushed, session_id)
+        self._open_responses: Dict[int, list] = {}  # streaming session_id -> [raw bytes not yet queued, held since]
+        self._pending_acks: Dict[int, tuple] = {}  # session_id -> completing chunk's (addr, txid, question, qtype)
+        # Callbacks queue responses from pool threads while the loop serves them;
+        # striped by session id so unrelated sessions do not contend
+        self._response_locks = [threading.Lock() for _ in range(16)]
         self.running = False
         self.sock = None
+        self._recv_buf = bytearray(512)
+        self._buf_pool: queue.SimpleQueue = queue.SimpleQueue()  # reusable 512-byte response buffers
+        self._mmsg = None  # recvmmsg batch receiver (Linux only)
+        self._wakeup_r = None  # socketpair used by stop() to wake the loop
+        self._wakeup_w = None
         
         # Chunking configuration
-        self.max_chunk_size = 180  # Max bytes per chunk after base32 encoding
+        self.max_chunk_size = 180  # Max bytes per chunk after base64url encoding
+        
+        # Largest message accepted from a client. Slot lists are sized from the
+        # total in the query, so it is bounded before anything is allocated
+        # (the client sends 32 base64url chars, i.e. 24 raw bytes, per chunk).
+        self.max_message_size = 64 * 1024
+        self.max_session_chunks = (self.max_message_size + 23) // 24
+        self.max_pending_sessions = 1024
+        
+        # Large receive buffer so bursts of pipelined chunks are not dropped
+        self.recv_buffer_size = 8 * 1024 * 1024
+        
+        # Datagrams drained per wake-up of the server loop
+        self.recv_batch = 64
+        
+        # Receive each batch with one recvmmsg(2) call (Linux only). Off by default:
+        # through ctypes it only pays off where syscalls are expensive.
+        self.use_recvmmsg = False
+        
+        # Linux SO_BUSY_POLL budget in microseconds (0, the default, leaves it unset).
+        # The loop waits in epoll on a non-blocking socket, where this only has an
+        # effect if net.core.busy_poll is also set system-wide.
+        self.busy_poll_usec = 0
+        
+        # A waiting client gets a short streamed segment once bytes have been held this long
+        self.stream_flush_delay = 0.05
+        
+        # Partial sessions idle for longer than this are dropped
+        self.session_ttl = 60.0
+        self.reap_interval = 5.0
         
         # Callback for when complete data is received
         self.on_data_received: Optional[Callable[[int, bytes, tuple], None]] = None
+        
+        # Constant answer RR start per query type (name pointer, type, class, TTL);
+        # A answers are fully constant
+        self._answer_templates = {
+            query_type: b'\xc0\x0c' + _ANSWER_FIXED.pack(query_type, 1, 300)
+            for query_type in (1, 16)
+        }
+        self._answer_templates[1] += _U16.pack(4) + socket.inet_aton("127.0.0.1")
+        
+        # Fixed pool that runs on_data_received off the loop thread (lives for one _run)
+        self._pool: Optional[ThreadPoolExecutor] = None
     
     def queue_response(self, session_id: int, data: bytes):
         """
@@ -313,7 +581,8 @@ class DNSTunnelServer:
             session_id: Session ID of the client
             data: Raw bytes to send (can be any size, will be chunked automatically)
         """
-        encoded = base64.b32encode(data).decode('ascii').lower().rstrip('=')
+        # Kept as bytes end to end: chunks go into the TXT record without re-encoding
+        encoded = base64.urlsafe_b64encode(data).rstrip(b'=')
         
         # Calculate how many chunks we need
         # Account for chunk header overhead: "CHUNK:N/T:"
@@ -322,7 +591,7 @@ class DNSTunnelServer:
         
         if len(encoded) <= effective_chunk_size:
             # Small enough to send in one chunk, no header needed
-            self.response_queue[session_id] = [encoded]
+            chunks = [encoded]
         else:
             # Need to chunk the response
             chunks = []
@@ -334,11 +603,103 @@ class DNSTunnelServer:
                 chunk_data = encoded[start:end]
                 
                 # Add chunk header
-                chunk_with_header = f"CHUNK:{i}/{total_chunks}:{chunk_data}"
+                chunk_with_header = b"CHUNK:%d/%d:%s" % (i, total_chunks, chunk_data)
                 chunks.append(chunk_with_header)
             
+            if self.debug:
+                print(f"[DNSTunnelServer] Response for session {session_id} split into {total_chunks} chunks ({len(data)} bytes)")
+        
+        with self._response_lock(session_id):
             self.response_queue[session_id] = chunks
-            print(f"[DNSTunnelServer] Response for session {session_id} split into {total_chunks} chunks ({len(data)} bytes)")
+            self._open_responses.pop(session_id, None)
+    
+    def open_response(self, session_id: int):
+        """
+        Start streaming a response to a client: feed it with append_response()
+        and finish it with close_response().
+        
+        The client may start fetching right away; until the stream is closed it
+        is told to wait whenever it gets ahead of the queued segments. If the
+        message that completed this session is still unacknowledged (the call
+        comes from on_data_received), it is ACKed now instead of when the
+        callback returns.
+        """
+        with self._response_lock(session_id):
+            self.response_queue[session_id] = []
+            self._open_responses[session_id] = [bytearray(), 0.0]
+        pending = self._pending_acks.pop(session_id, None)
+        if pending:
+            self._send_response(*pending)
+    
+    def append_response(self, session_id: int, data: bytes):
+        """
+        Add raw bytes to an open response. Bytes are coalesced into full
+        segments; a shorter segment is only cut for a client that is waiting
+        (see stream_flush_delay).
+        """
+        with self._response_lock(session_id):
+            stream = self._open_responses.get(session_id)
+            if stream is None:
+                return
+            pending = stream[0]
+            if not pending:
+                stream[1] = time.monotonic()
+            pending += data
+            # Whole segments only, so each segment's base64url is a multiple of 3 raw bytes
+            segment_size = (self.max_chunk_size - 20) // 4 * 3
+            queued = len(pending) - len(pending) % segment_size
+            if queued:
+                self._queue_segments(session_id, pending[:queued], final=False)
+                del pending[:queued]
+                stream[1] = time.monotonic()
+    
+    def close_response(self, session_id: int):
+        """Queue whatever is left of an open response and mark it complete."""
+        with self._response_lock(session_id):
+            stream = self._open_responses.pop(session_id, None)
+            if stream is None:
+                return
+            pending = stream[0]
+            if not self.response_queue.get(session_id) and not pending:
+                # Nothing was streamed: behave like an empty response
+                self.response_queue.pop(session_id, None)
+            else:
+                self._queue_segments(session_id, pending, final=True)
+    
+    def _flush_idle_stream(self, session_id: int, stream: list):
+        """
+        Queue the held bytes of a stream as a short segment for a waiting
+        client, once they have sat for stream_flush_delay. Called with the
+        session's response lock held; up to 2 bytes stay behind so the
+        base64url stays continuous.
+        """
+        pending, held_since = stream
+        flushable = len(pending) - len(pending) % 3
+        now = time.monotonic()
+        if flushable and now - held_since >= self.stream_flush_delay:
+            self._queue_segments(session_id, pending[:flushable], final=False)
+            del pending[:flushable]
+            stream[1] = now
+    
+    def _response_lock(self, session_id: int) -> threading.Lock:
+        """Lock guarding response_queue and _open_responses for session_id."""
+        return self._response_locks[session_id & 15]
+    
+    def _queue_segments(self, session_id: int, data: bytes, final: bool):
+        """
+        Append streamed segments as "CHUNK:N/0:data" while the total is unknown;
+        the final segment carries the real total ("CHUNK:N/T:data", T = N + 1).
+        Called with the session's response lock held.
+        """
+        chunks = self.response_queue[session_id]
+        encoded = base64.urlsafe_b64encode(data).rstrip(b'=')
+        effective_chunk_size = self.max_chunk_size - 20
+        pieces = [encoded[i:i+effective_chunk_size]
+                  for i in range(0, len(encoded), effective_chunk_size)] or [b'']
+        for i, piece in enumerate(pieces):
+            index = len(chunks)
+            total = index + 1 if final and i == len(pieces) - 1 else 0
+            chunks.append(b"CHUNK:%d/%d:%s" % (index, total, piece))
     
     def start(self, blocking: bool = True):
         """
@@ -356,184 +717,398 @@ class DNSTunnelServer:
     def stop(self):
         """Stop the server."""
         self.running = False
+        if self._wakeup_w:
+            try:
+                self._wakeup_w.send(b'\x00')
+            except OSError:
+                pass
         if self.sock:
             self.sock.close()
     
     # Internal methods
     def _run(self):
-        """Main server loop."""
+        """Main server loop. Queries are handled inline on this thread."""
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._tune_socket()
         
         try:
             self.sock.bind((self.listen_ip, self.listen_port))
+            self.sock.setblocking(False)
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 4,
+                                            thread_name_prefix="DNSTunnelServer")
+            if self.use_recvmmsg and sys.platform.startswith('linux'):
+                try:
+                    self._mmsg = _RecvMmsg(self.sock, self.recv_batch, len(self._recv_buf))
+                except (OSError, AttributeError):
+                    self._mmsg = None
             self.running = True
-            self.sock.settimeout(0.1)
             
-            while self.running:
-                try:
-                    data, addr = self.sock.recvfrom(512)
-                    threading.Thread(target=self._handle_query, args=(data, addr), daemon=True).start()
-                except socket.timeout:
-                    continue
-                except KeyboardInterrupt:
-                    break
+            with selectors.DefaultSelector() as selector:
+                selector.register(self.sock, selectors.EVENT_READ)
+                selector.register(self._wakeup_r, selectors.EVENT_READ)
+                next_reap = time.monotonic() + self.reap_interval
+                
+                while self.running:
+                    if time.monotonic() >= next_reap:
+                        self._reap_sessions()
+                        next_reap = time.monotonic() + self.reap_interval
+                    
+                    try:
+                        # Block until queries arrive, stop() wakes us, or a reap is due
+                        for key, _ in selector.select(timeout=max(0.0, next_reap - time.monotonic())):
+                            if key.fileobj is self.sock:
+                                self._drain_socket()
+                    except KeyboardInterrupt:
+                        break
         except Exception as e:
-            print(f"[DNSTunnelServer] Error: {e}")
+            if self.running:
+                print(f"[DNSTunnelServer] Error: {e}")
         finally:
             self.stop()
+            if self._pool:
+                # Drop queued callbacks; one still running (e.g. on an LLM) finishes on its own
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+            for sock in (self._wakeup_r, self._wakeup_w):
+                if sock:
+                    sock.close()
+            self._wakeup_r = self._wakeup_w = None
+            # Bound to the socket that was just closed; a restart rebuilds it if enabled
+            self._mmsg = None
     
-    def _handle_query(self, data: bytes, addr: tuple):
-        """Handle incoming DNS query."""
-        parsed = self._parse_dns_query(data)
-        if not parsed:
+    def _drain_socket(self):
+        """Handle up to recv_batch queued datagrams, reusing one receive buffer."""
+        if self._mmsg:
+            # One recvmmsg call for the whole batch
+            try:
+                packets = self._mmsg.recv()
+            except OSError as e:
+                # Like the single-receive path: a pending ICMP error (ECONNREFUSED)
+                # or a transient failure (ENOBUFS) must not stop the loop
+                log.debug("Batch receive failed: %r", e)
+                return
+            for view, addr in packets:
+                try:
+                    self._handle_query(view, addr)
+                except Exception as e:
+                    log.warning("Error handling query from %s: %r", addr, e, exc_info=self.debug)
             return
         
-        transaction_id, query_name, query_type = parsed
-        decoded = self._decode_subdomain(query_name)
+        buf = self._recv_buf
+        view = memoryview(buf)
+        for _ in range(self.recv_batch):
+            try:
+                size, addr = self.sock.recvfrom_into(buf)
+            except BlockingIOError:
+                return
+            except ConnectionResetError:
+                continue
+            
+            # The view is only valid until the next receive; queries are handled inline
+            try:
+                self._handle_query(view[:size], addr)
+            except Exception as e:
+                # One line by default: malformed traffic can hit this at line rate
+                log.warning("Error handling query from %s: %r", addr, e, exc_info=self.debug)
+    
+    def _tune_socket(self):
+        """Enlarge the receive buffer and disable path MTU discovery (best effort)."""
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.recv_buffer_size)
+            # The kernel may cap this (Linux: net.core.rmem_max, and reports it doubled)
+            actual = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+            if actual < self.recv_buffer_size:
+                log.info("Receive buffer capped at %d bytes", actual)
+        except OSError:
+            pass
+        
+        if sys.platform.startswith('linux'):
+            try:
+                # IP_MTU_DISCOVER = IP_PMTUDISC_DONT: never set DF, let large responses fragment
+                self.sock.setsockopt(socket.IPPROTO_IP, getattr(socket, 'IP_MTU_DISCOVER', 10),
+                                     getattr(socket, 'IP_PMTUDISC_DONT', 0))
+            except OSError:
+                pass
+            
+            if self.busy_poll_usec:
+                # Lets epoll busy-poll this socket's NIC queue when net.core.busy_poll
+                # is enabled; on its own it does nothing for non-blocking receives.
+                # Values above net.core.busy_read need CAP_NET_ADMIN.
+                for option, value in ((getattr(socket, 'SO_BUSY_POLL', 46), self.busy_poll_usec),
+                                      (getattr(socket, 'SO_PREFER_BUSY_POLL', 69), 1)):
+                    try:
+                        self.sock.setsockopt(socket.SOL_SOCKET, option, value)
+                    except OSError:
+                        pass
+    
+    def _handle_query(self, data: bytes, addr: tuple):
+        """Handle incoming DNS query."""
+        fused = self._parse_and_decode(data)
+        if fused:
+            transaction_id, query_type, question, decoded = fused
+        else:
+            parsed = self._parse_dns_query(data)
+            if not parsed:
+                return
+            
+            transaction_id, query_name, query_type, question = parsed
+            decoded = self._decode_subdomain(query_name)
         
         if not decoded:
-            response = self._create_dns_response(transaction_id, query_name, query_type)
-            self.sock.sendto(response, addr)
+            self._send_response(addr, transaction_id, question, query_type)
             return
         
         session_id, chunk_num, total_chunks, chunk_data = decoded
         
         # Handle receive request (possibly for a specific chunk)
         if chunk_data == "RECV":
-            if session_id in self.response_queue:
-                chunks = self.response_queue[session_id]
-                
-                if chunk_num < len(chunks):
+            # An empty answer means no response queued or no more chunks
+            response_data = None
+            with self._response_lock(session_id):
+                chunks = self.response_queue.get(session_id)
+                stream = self._open_responses.get(session_id)
+                streaming = stream is not None
+                if streaming and chunk_num >= len(chunks):
+                    self._flush_idle_stream(session_id, stream)
+                if chunks is not None and chunk_num < len(chunks):
                     # Send specific chunk
                     response_data = chunks[chunk_num]
-                    response = self._create_dns_response(transaction_id, query_name, 
-                                                        query_type, response_data)
-                    self.sock.sendto(response, addr)
                     
                     # If this was the last chunk, clean up
-                    if chunk_num >= len(chunks) - 1:
+                    if not streaming and chunk_num >= len(chunks) - 1:
                         del self.response_queue[session_id]
-                else:
-                    # No more chunks
-                    response = self._create_dns_response(transaction_id, query_name, query_type)
-                    self.sock.sendto(response, addr)
-            else:
-                # No response queued
-                response = self._create_dns_response(transaction_id, query_name, query_type)
-                self.sock.sendto(response, addr)
+                elif streaming:
+                    # Client is ahead of the stream; ':' is not in base64url, so this can't be data
+                    response_data = b"WAIT:"
+            self._send_response(addr, transaction_id, question, query_type, response_data)
+            return
+        
+        # Reject totals and chunk numbers that would size or index the slot list out of bounds
+        if not 0 < total_chunks <= self.max_session_chunks or chunk_num >= total_chunks:
+            self._send_response(addr, transaction_id, question, query_type)
             return
         
-        # Store chunk
-        self.sessions[session_id][chunk_num] = chunk_data
-        self.session_metadata[session_id] = (total_chunks, time.time())
+        # Store chunk (one clock read per chunk; monotonic so clock changes can't reap sessions)
+        now = time.monotonic()
+        slots = self.sessions.get(session_id)
+        if slots is None or len(slots) != total_chunks:
+            if slots is None and len(self.sessions) >= self.max_pending_sessions:
+                # Too many partial messages in flight; wait for the reaper
+                self._send_response(addr, transaction_id, question, query_type)
+                return
+            slots = self.sessions[session_id] = [None] * total_chunks
+            self.session_metadata[session_id] = [total_chunks, 0, now]
+            heapq.heappush(self._expiry_heap, (now, session_id))
+        metadata = self.session_metadata[session_id]
+        if slots[chunk_num] is None:
+            slots[chunk_num] = chunk_data
+            metadata[1] += 1
+        metadata[2] = now
         
         # Try to assemble complete message
         complete_data = self._assemble_session_data(session_id)
         if complete_data:
-            # Call user's callback
-            if self.on_data_received:
-                self.on_data_received(session_id, complete_data, addr)
-            
             # Clean up session
             del self.sessions[session_id]
             del self.session_metadata[session_id]
+            
+            if self.on_data_received:
+                # The callback may block (e.g. on an LLM), so run it off the
+                # loop thread. The completing chunk is ACKed once it returns,
+                # or as soon as it opens a streamed response.
+                self._pending_acks[session_id] = (addr, transaction_id, question, query_type)
+                self._pool.submit(self._deliver, session_id, complete_data, addr)
+                return
         
         # Send response
-        response = self._create_dns_response(transaction_id, query_name, query_type)
-        self.sock.sendto(response, addr)
+        self._send_response(addr, transaction_id, question, query_type)
     
-    def _decode_subdomain(self, query_name: str):
-        """Decode data from subdomain."""
+    def _deliver(self, session_id: int, data: bytes, addr: tuple):
+        """Call the user's callback, then ACK the chunk that completed the message."""
         try:
-            if not query_name.endswith(self.domain):
-                return None
-            subdomain = query_name[:-len(self.domain)-1]
-            
-            # Check for chunk receive request: recv-SESSION-CHUNKNUM
-            if subdomain.startswith('recv-'):
-                parts = subdomain.split('-')
-                session_id = int(parts[1])
-                chunk_num = int(parts[2]) if len(parts) > 2 else 0
-                return (session_id, chunk_num, -1, "RECV")
-            
-            # Regular data: sessionid-chunknum-totalchunks-data
-            parts = subdomain.split('-', 3)
-            if len(parts) != 4:
-                return None
-            return int(parts[0]), int(parts[1]), int(parts[2]), parts[3]
-        except:
+            self.on_data_received(session_id, data, addr)
+        except Exception as e:
+            log.warning("Callback error for session %s: %r", session_id, e, exc_info=self.debug)
+        finally:
+            # A stream left open by a failed callback would keep the client waiting
+            self.close_response(session_id)
+            pending = self._pending_acks.pop(session_id, None)
+            if pending:
+                self._send_response(*pending)
+    
+    def _reap_sessions(self):
+        """Drop partial sessions that have not seen a chunk within session_ttl.
+        
+        Only heap entries older than the TTL are looked at. Entries are checked
+        against the live metadata: finished sessions are skipped and sessions
+        that saw chunks since the push are re-queued at their last_seen time.
+        """
+        heap = self._expiry_heap
+        cutoff = time.monotonic() - self.session_ttl
+        while heap and heap[0][0] < cutoff:
+            _, session_id = heapq.heappop(heap)
+            metadata = self.session_metadata.get(session_id)
+            if metadata is None:
+                continue
+            if metadata[2] >= cutoff:
+                heapq.heappush(heap, (metadata[2], session_id))
+                continue
+            self.sessions.pop(session_id, None)
+            del self.session_metadata[session_id]
+    
+    def _decode_subdomain(self, query_name: bytes):
+        """Decode data from subdomain."""
+        suffix = self._domain_suffix_bytes
+        if not query_name.endswith(suffix) and query_name[-len(suffix):].lower() != suffix:
             return None
+        end = len(query_name) - len(suffix)
+        
+        # Regular data: sessionid-chunknum-totalchunks-data
+        m = self._match_data(query_name, 0, end)
+        if m:
+            session_id, chunk_num, total_chunks, chunk_data = m.groups()
+            return int(session_id), int(chunk_num), int(total_chunks), chunk_data
+        
+        # Chunk receive request: recv-SESSION-CHUNKNUM
+        m = self._match_recv(query_name, 0, end)
+        if m:
+            session_id, chunk_num = m.groups()
+            return int(session_id), int(chunk_num or 0), -1, "RECV"
+        return None
     
     def _assemble_session_data(self, session_id: int) -> Optional[bytes]:
         """Assemble complete message from chunks."""
-        if session_id not in self.session_metadata:
+        metadata = self.session_metadata.get(session_id)
+        if metadata is None:
             return None
-        total_chunks, _ = self.session_metadata[session_id]
-        session_data = self.sessions[session_id]
-        if len(session_data) != total_chunks:
+        total_chunks, arrived, _ = metadata
+        if arrived != total_chunks:
             return None
-        encoded_data = ''.join(session_data[i] for i in range(total_chunks))
+        encoded_data = b''.join(self.sessions[session_id])
         try:
-            padding = (8 - len(encoded_data) % 8) % 8
-            encoded_data += '=' * padding
-            return base64.b32decode(encoded_data.upper())
+            padding = (4 - len(encoded_data) % 4) % 4
+            return base64.urlsafe_b64decode(encoded_data + b'=' * padding)
         except:
             return None
     
+    def _parse_and_decode(self, data: bytes):
+        """
+        Parse and decode in one walk for the shape our client sends: a single
+        tunnel label followed by the domain's labels. The tunnel label is
+        matched in place and the rest is compared against the domain in wire
+        format, so no name is built. Returns (transaction_id, query_type,
+        question, decoded) or None to fall back to the general parser.
+        """
+        if len(data) < 13:
+            return None
+        length = data[12]
+        name_end = 13 + length
+        question_end = name_end + len(self._domain_wire) + 4
+        if length > 63 or len(data) < question_end:
+            return None
+        # Compare in place; only mixed-case names (e.g. 0x20 resolvers) pay for a lowered copy
+        domain = data[name_end:question_end-4]
+        if domain != self._domain_wire and bytes(domain).lower() != self._domain_wire:
+            return None
+        
+        m = self._match_data(data, 13, name_end)
+        if m:
+            session_id, chunk_num, total_chunks, chunk_data = m.groups()
+            decoded = int(session_id), int(chunk_num), int(total_chunks), chunk_data
+        else:
+            m = self._match_recv(data, 13, name_end)
+            if not m:
+                return None
+            session_id, chunk_num = m.groups()
+            decoded = int(session_id), int(chunk_num or 0), -1, "RECV"
+        
+        transaction_id = _U16.unpack_from(data, 0)[0]
+        query_type = _U16.unpack_from(data, question_end - 4)[0]
+        return transaction_id, query_type, bytes(data[12:question_end]), decoded
+    
     def _parse_dns_query(self, data: bytes):
         """Parse DNS query packet."""
         try:
             if len(data) < 12:
                 return None
-            transaction_id = struct.unpack('!H', data[0:2])[0]
+            transaction_id = _U16.unpack_from(data, 0)[0]
+            # One length read per label; a truncated packet raises IndexError
             offset = 12
             labels = []
-            while offset < len(data) and data[offset] != 0:
+            length = data[offset]
+            while length:
+                # Labels are at most 63 bytes; this also rejects compression pointers
+                if length > 63:
+                    return None
+                start = offset + 1
+                offset = start + length
+                labels.append(data[start:offset])
                 length = data[offset]
-                offset += 1
-                labels.append(data[offset:offset+length].decode('ascii', errors='ignore'))
-                offset += length
-            query_name = '.'.join(labels).lower()
+            query_name = b'.'.join(labels)
             offset += 1
-            query_type = struct.unpack('!H', data[offset:offset+2])[0]
-            return transaction_id, query_name, query_type
-        except:
+            query_type, _ = _TYPECLASS.unpack_from(data, offset)
+            
+            # Raw question section (name, type, class), echoed back in the response
+            question = bytes(data[12:offset+4])
+            return transaction_id, query_name, query_type, question
+        except (IndexError, struct.error):
+            # Truncated packet
             return None
     
-    def _create_dns_response(self, transaction_id: int, query_name: str, 
-                            query_type: int, response_data: Optional[str] = None) -> bytes:
-        """Create DNS response packet."""
+    def _send_response(self, addr: tuple, transaction_id: int, question: bytes,
+                       query_type: int, response_data: Optional[bytes] = None):
+        """Build a response in a pooled buffer and send it without copying it out."""
+        txt_data = response_data if query_type == 16 and response_data else b''
+        needed = len(question) + len(txt_data) + 64
+        if needed > 512:
+            # Oversized names/payloads: one-off buffer, not worth pooling
+            buf = bytearray(needed)
+        else:
+            try:
+                buf = self._buf_pool.get_nowait()
+            except queue.Empty:
+                buf = bytearray(512)
+        try:
+            length = self._write_dns_response(buf, transaction_id, question, query_type, txt_data)
+            with memoryview(buf) as view:
+                self.sock.sendto(view[:length], addr)
+        finally:
+            if len(buf) == 512:
+                self._buf_pool.put(buf)
+    
+    def _write_dns_response(self, buf: bytearray, transaction_id: int, question: bytes,
+                            query_type: int, txt_data: bytes) -> int:
+        """
+        Write a response into buf in place and return its length.
+        question is the query's raw question section and is echoed as-is.
+        """
         flags = 0x8180
-        header = struct.pack('!HHHHHH', transaction_id, flags, 1, 1, 0, 0)
-        
-        question = b''
-        for label in query_name.split('.'):
-            if label:
-                question += struct.pack('B', len(label)) + label.encode('ascii')
-        question += b'\x00'
-        question += struct.pack('!HH', query_type, 1)
-        
-        answer = b'\xc0\x0c'
-        answer += struct.pack('!HHI', query_type, 1, 300)
-        
-        if query_type == 1:
-            ip_bytes = socket.inet_aton("127.0.0.1")
-            answer += struct.pack('!H', 4) + ip_bytes
-        elif query_type == 16:
-            if response_data:
-                txt_data = response_data.encode('ascii')
-                
-                # Split into 255-byte chunks for TXT record
-                chunks = []
+        _HDR.pack_into(buf, 0, transaction_id, flags, 1, 1, 0, 0)
+        offset = 12 + len(question)
+        buf[12:offset] = question
+        
+        answer = self._answer_templates.get(query_type)
+        if answer is None:
+            answer = b'\xc0\x0c' + _ANSWER_FIXED.pack(query_type, 1, 300)
+        buf[offset:offset+len(answer)] = answer
+        offset += len(answer)
+        
+        if query_type == 16:
+            if txt_data:
+                # Split into 255-byte strings for TXT record, after the rdlength
+                rdlength_offset = offset
+                offset += 2
                 max_chunk = 255
                 for i in range(0, len(txt_data), max_chunk):
                     chunk = txt_data[i:i+max_chunk]
-                    chunks.append(struct.pack('B', len(chunk)) + chunk)
-                
-                txt_record = b''.join(chunks)
-                answer += struct.pack('!H', len(txt_record)) + txt_record
+                    buf[offset] = len(chunk)
+                    buf[offset+1:offset+1+len(chunk)] = chunk
+                    offset += len(chunk) + 1
+                _U16.pack_into(buf, rdlength_offset, offset - rdlength_offset - 2)
             else:
-                answer += struct.pack('!H', 1) + b'\x00'
+                _TXT_START.pack_into(buf, offset, 1, 0)
+                offset += 3
         
-        return header + question + answer
\ No newline at end of file
+        return offset
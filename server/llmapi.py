@@ -1,4 +1,5 @@
 import os
+import httpx
 from groq import Groq
 
 class LLM:
@@ -6,6 +7,11 @@ class LLM:
         os.environ["GROQ_API_KEY"] = "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"  # Replace with your actual API key
         self.client = Groq(
             api_key=os.environ.get("GROQ_API_KEY"),  # This is the default and can be omitted
+            # One pooled connection reused across prompts, kept warm between them
+            http_client=httpx.Client(
+                limits=httpx.Limits(max_keepalive_connections=4, keepalive_expiry=60),
+                follow_redirects=True,
+            ),
         )
 
         self.messages = []
@@ -50,13 +56,10 @@ Vent på oppgavetekst eller instruks før du skriver.
         self.top_p = top_p
         self.reasoning_effort = reasoning_effort
 
-    def _get_completion_response(self, completion):
-        result = ""
-        for chunk in completion:
-            result += chunk.choices[0].delta.content or ""
-        return result
-
     def prompt(self, content: str):
+        return "".join(self.stream(content))
+
+    def stream(self, content: str):
         self.messages.append({
             "role": "user",
             "content": content
@@ -72,9 +75,14 @@ Vent på oppgavetekst eller instruks før du skriver.
             stop=None
         )
 
-        response = self._get_completion_response(completion)
+        parts = []
+        for chunk in completion:
+            piece = chunk.choices[0].delta.content
+            if piece:
+                parts.append(piece)
+                yield piece
+
         self.messages.append({
             "role": "assistant",
-            "content": response
+            "content": "".join(parts)
         })
-        return response
\ No newline at end of file
@@ -8,7 +8,7 @@ import llmapi
 class Server:
     def __init__(self, port: int, debug: bool = False, domain: str = "ordbokene.no"):
         self.debug = debug
-        self.tunnel = dnstunnel.DNSTunnelServer("0.0.0.0", port, domain)
+        self.tunnel = dnstunnel.DNSTunnelServer("0.0.0.0", port, domain, debug=debug)
         self.llm = llmapi.LLM()
         self.commands = {
             "PROMPT": self._prompt,
@@ -33,17 +33,30 @@ class Server:
         #id, command, args = self._parse_data(data)
         data = data.decode()
         command, args = self._parse_data(data)
-        print(f"Handling command: {command} with args: {args}")
-        response = self.commands[command](args).encode()
-        self.tunnel.queue_response(session_id, response)
+        if self.debug:
+            print(f"Handling command: {command} with args: {args}")
+        response = self.commands[command](args)
+        if isinstance(response, str):
+            self.tunnel.queue_response(session_id, response.encode())
+            return
+
+        # Streamed response: the client starts fetching while it is generated
+        self.tunnel.open_response(session_id)
+        try:
+            for piece in response:
+                self.tunnel.append_response(session_id, piece.encode())
+        finally:
+            self.tunnel.close_response(session_id)
 
 
-    def _prompt(self, args: list) -> str:
-        print("Processing PROMPT command... arguments:", args)
+    def _prompt(self, args: list):
+        if self.debug:
+            print("Processing PROMPT command... arguments:", args)
         prompt_content = args[0]
-        response = self.llm.prompt(prompt_content)
-        print("LLM response:", response)
-        return response
+        for piece in self.llm.stream(prompt_content):
+            if self.debug:
+                print("LLM response:", piece)
+            yield piece
     
     def _ack(self, args: list) -> str:
         return "ACK"
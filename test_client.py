@@ -1,4 +1,5 @@
 import dnstunnel
+from client.client import Client
 
 server_ip = "127.0.0.1"
 server_port = 7777
@@ -13,4 +14,30 @@ res = client.send_and_receive("PING".encode())
 if res.decode() == "PONG":
     print("Sent ping to server and received pong successfully.")
 else:
-    print("Failed to receive pong from server.")
\ No newline at end of file
+    print("Failed to receive pong from server.")
+
+message = "Streamed echo. " * 40
+res = client.send_and_receive(f"STREAM:{message}".encode())
+if res is not None and res.decode() == message:
+    print("Sent stream request and received the streamed echo successfully.")
+else:
+    print("Failed to receive the streamed echo from server.")
+
+expected = "".join(f"token{i:03d}" for i in range(150))
+res = client.send_and_receive("SLOW".encode())
+if res is not None and res.decode() == expected:
+    print("Received the complete slow stream successfully.")
+else:
+    print("Failed to receive the complete slow stream from server.")
+
+client.send("FLOOD".encode())
+if client.receive(max_stream_chunks=200) is None:
+    print("Stopped a stream that exceeded the chunk limit successfully.")
+else:
+    print("Failed to stop a stream that exceeded the chunk limit.")
+
+parsed = Client(server_ip, server_port, domain)._parse_response("ID|||XDATA|||no|||DATA|||payload|||EXTRA")
+if parsed == "payload":
+    print("Parsed the DATA field of a response with trailing fields successfully.")
+else:
+    print("Failed to parse the DATA field of a response with trailing fields.")
\ No newline at end of file
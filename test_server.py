@@ -1,3 +1,4 @@
+import time
 import dnstunnel
 
 def handle_data(session_id, data, addr):
@@ -6,6 +7,30 @@ def handle_data(session_id, data, addr):
         response = "PONG".encode()
         server.queue_response(session_id, response)
         print("Got ping. Sent pong.")
+    elif data.startswith(b"STREAM:"):
+        # Echo the payload back as a streamed response, a few bytes at a time
+        payload = data[len(b"STREAM:"):]
+        server.open_response(session_id)
+        for i in range(0, len(payload), 16):
+            server.append_response(session_id, payload[i:i+16])
+            time.sleep(0.01)
+        server.close_response(session_id)
+        print("Got stream request. Streamed it back.")
+    elif data.decode() == "SLOW":
+        # Trickle 150 short tokens so the stream is flushed in many short segments
+        server.open_response(session_id)
+        for i in range(150):
+            server.append_response(session_id, f"token{i:03d}".encode())
+            time.sleep(0.06)
+        server.close_response(session_id)
+        print("Got slow stream request. Streamed 150 tokens.")
+    elif data.decode() == "FLOOD":
+        # Stream 300 full segments, past the cap the client sets for this request
+        server.open_response(session_id)
+        for i in range(300):
+            server.append_response(session_id, b"F" * 120)
+        server.close_response(session_id)
+        print("Got flood request. Streamed 300 segments.")
 
 server_ip = "0.0.0.0"
 server_port = 7777